@@ -0,0 +1,1221 @@
+"""
+File, S3 and HDFS I/O helpers shared by the benchmark tests
+
+"""
+
+import asyncio
+import ctypes
+import ctypes.util
+import errno
+import fcntl
+import functools
+import io
+import mmap
+import multiprocessing
+import os
+import queue
+import random
+import shutil
+import socket
+import subprocess
+import tarfile
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, as_completed, wait
+
+import boto3
+import urllib3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+from timing import timed
+
+try:
+    import aioboto3
+    from aiobotocore.config import AioConfig
+except ImportError:
+    aioboto3 = None
+
+try:
+    import liburing
+except ImportError:
+    liburing = None
+
+try:
+    import pyarrow
+    import pyarrow.fs as pafs
+except ImportError:
+    pafs = None
+
+try:
+    import h2  # httpx needs it for HTTP/2
+    import httpx
+except ImportError:
+    httpx = None
+
+
+# Consumed pages are dropped from the page cache every 64MB of sequential I/O
+_DROP_WINDOW = 64 * 1024 * 1024
+
+
+def _fadvise(fd, offset, length, advice):
+    """Give the kernel an access-pattern hint; a no-op where posix_fadvise is unavailable
+
+    Args:
+        fd: File descriptor
+        offset: Start of the range in bytes
+        length: Length of the range in bytes (0 means to end of file)
+        advice: Name of the os.POSIX_FADV_* constant
+    """
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    try:
+        os.posix_fadvise(fd, offset, length, getattr(os, advice))
+    except OSError:
+        pass  # Only a hint, never fail the benchmark over it
+
+
+# O_DIRECT transfers need block-aligned buffers, offsets and lengths
+_DIRECT_ALIGNMENT = 4096
+
+
+def _open_direct(path, flags, mode=0o644):
+    """Open a file with O_DIRECT | O_NOATIME, falling back to buffered I/O if refused
+
+    Some filesystems (tmpfs, many FUSE mounts such as hopsfs-mount) reject O_DIRECT.
+
+    Returns:
+        tuple: (fd, direct) where direct tells whether O_DIRECT is in effect
+    """
+    direct_flags = getattr(os, 'O_DIRECT', 0) | getattr(os, 'O_NOATIME', 0)
+    if direct_flags:
+        try:
+            return os.open(path, flags | direct_flags, mode), bool(getattr(os, 'O_DIRECT', 0))
+        except OSError as e:
+            if e.errno not in (errno.EINVAL, errno.EPERM, errno.EOPNOTSUPP):
+                raise
+    return os.open(path, flags, mode), False
+
+
+# errno values meaning "this filesystem cannot reserve space up front"
+_FALLOCATE_UNSUPPORTED = (errno.EOPNOTSUPP, errno.ENOTSUP, errno.ENOSYS, errno.EINVAL)
+
+
+def _load_fallocate():
+    """Look up the raw fallocate(2) wrapper in libc
+
+    os.posix_fallocate is not usable here: where the filesystem refuses
+    fallocate, glibc emulates it by writing a byte into every block, which on
+    a FUSE mount means one write request per 4KB.
+
+    Returns:
+        ctypes function, or None where libc has no fallocate (non-Linux)
+    """
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        fallocate = getattr(libc, 'fallocate64', None) or libc.fallocate
+    except (OSError, AttributeError):
+        return None
+    fallocate.argtypes = [ctypes.c_int, ctypes.c_int, ctypes.c_int64, ctypes.c_int64]
+    fallocate.restype = ctypes.c_int
+    return fallocate
+
+
+_FALLOCATE = _load_fallocate()
+
+
+def _preallocate(fd, size_bytes):
+    """Reserve size_bytes of real extents for fd in one fallocate(2) call
+
+    Returns:
+        bool: False if the filesystem (e.g. FUSE mounts) or platform does not support it
+    """
+    if size_bytes <= 0 or _FALLOCATE is None:
+        return False
+    if _FALLOCATE(fd, 0, 0, size_bytes) == 0:
+        return True
+    err = ctypes.get_errno()
+    if err not in _FALLOCATE_UNSUPPORTED:
+        raise OSError(err, os.strerror(err))
+    return False
+
+
+# One shared 1MB zero block, repeated up to IOV_MAX times per pwritev call; kept as a
+# memoryview so short tails are zero-copy slices instead of new bytes objects
+_ZERO_MV = memoryview(bytes(1024 * 1024))
+_IOV_MAX = min(os.sysconf('SC_IOV_MAX'), 1024) if hasattr(os, 'sysconf') else 1024
+
+
+def _write_zeros_vectored(fd, size_bytes):
+    """Write size_bytes of real zeros, about 1GB per pwritev syscall"""
+    block = len(_ZERO_MV)
+    if not hasattr(os, 'pwritev'):
+        written = 0
+        while written < size_bytes:
+            remaining = size_bytes - written
+            written += os.write(fd, _ZERO_MV if remaining >= block else _ZERO_MV[:remaining])
+        return
+
+    offset = 0
+    while offset < size_bytes:
+        remaining = size_bytes - offset
+        iov = [_ZERO_MV] * min(_IOV_MAX, remaining // block)
+        if not iov:
+            iov = [_ZERO_MV[:remaining]]
+        offset += os.pwritev(fd, iov, offset)  # Partial writes simply resume at the new offset
+
+
+def write_large_file(file_path, size_gb, sparse=False, fill=False):
+    """Create a zero-filled file of specified size in GB without streaming data through Python
+
+    Args:
+        file_path: File path to create
+        size_gb: Size of the file in GB
+        sparse: Only set the file size (ftruncate) instead of reserving disk space
+        fill: Write real zero blocks with vectored pwritev instead of allocating them
+              (for filesystems that zero preallocated extents on demand)
+    """
+    size_bytes = int(size_gb * 1024 * 1024 * 1024)
+
+    fd = os.open(file_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        if fill:
+            _write_zeros_vectored(fd, size_bytes)
+            return
+        # Reserve real extents in the kernel; reads return zeros
+        if not sparse and _preallocate(fd, size_bytes):
+            return
+        # Sparse file: same size and zero contents, no blocks allocated
+        os.ftruncate(fd, size_bytes)
+    finally:
+        os.close(fd)
+
+
+# 1MB of incompressible pseudo-random bytes, generated once and reused for every small file
+_SMALL_PAD = memoryview(random.Random(0).randbytes(1024 * 1024))
+
+
+def write_small_file(file_path, size_kb, urandom=False):
+    """Write a small file of specified size in KB
+
+    Args:
+        file_path: File path to create
+        size_kb: Size of the file in KB
+        urandom: Fill every chunk with fresh os.urandom() bytes instead of the
+                 shared pseudo-random pad (only when unique content matters)
+    """
+    size_bytes = int(size_kb * 1024)
+    with open(file_path, 'wb') as f:
+        while size_bytes > 0:
+            to_write = min(size_bytes, len(_SMALL_PAD))
+            f.write(os.urandom(to_write) if urandom else _SMALL_PAD[:to_write])
+            size_bytes -= to_write
+
+
+# ioctl request number for FICLONE (reflink a whole file) from linux/fs.h
+_FICLONE = 0x40049409
+
+
+def replicate_file(template_path, file_path, link=True):
+    """Create file_path with the contents of template_path without rewriting the data
+
+    Args:
+        template_path: Existing file to replicate
+        file_path: File path to create
+        link: Hard-link to the template (one directory entry insert); otherwise
+              reflink it with FICLONE, falling back to a regular copy
+    """
+    if os.path.lexists(file_path):
+        os.remove(file_path)
+
+    if link:
+        os.link(template_path, file_path)
+        return
+
+    with open(template_path, 'rb') as src, open(file_path, 'wb') as dst:
+        try:
+            # Share extents copy-on-write on XFS/Btrfs
+            fcntl.ioctl(dst.fileno(), _FICLONE, src.fileno())
+            return
+        except OSError:
+            pass
+    shutil.copyfile(template_path, file_path)
+
+
+def run_bounded(executor, fn, jobs, max_in_flight):
+    """Run fn(*args) on executor for each args tuple in jobs, at most max_in_flight at a time
+
+    A new job is submitted as soon as one finishes, so only max_in_flight
+    futures exist at once however many jobs there are. Raises the first failure.
+    """
+    pending = set()
+    for args in jobs:
+        if len(pending) >= max_in_flight:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                future.result()
+        pending.add(executor.submit(fn, *args))
+    for future in as_completed(pending):
+        future.result()
+
+
+def replicate_files(template_path, file_paths, link=True, max_workers=32):
+    """Replicate template_path to every path in file_paths from a thread pool
+
+    Prints progress every 1000 files.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(replicate_file, template_path, file_path, link) for file_path in file_paths]
+        for done, future in enumerate(as_completed(futures), 1):
+            future.result()
+            if done % 1000 == 0:
+                print(f"  Replicated {done}/{len(file_paths)} files...")
+
+
+def _copy_file_direct(src_path, dst_path, chunk_size, depth=4):
+    """Copy a file with O_DIRECT on both ends, overlapping reads with writes
+
+    A reader thread fills depth page-aligned buffers while this thread writes
+    filled ones out, so neither file idles while the other is busy.
+    """
+    chunk_size = max(_DIRECT_ALIGNMENT, chunk_size - chunk_size % _DIRECT_ALIGNMENT)
+    src_fd, _ = _open_direct(src_path, os.O_RDONLY)
+    try:
+        dst_fd, dst_direct = _open_direct(dst_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC)
+        try:
+            _preallocate(dst_fd, os.fstat(src_fd).st_size)
+            with mmap.mmap(-1, chunk_size * depth) as buf:
+                view = memoryview(buf)
+                slots = [view[i * chunk_size:(i + 1) * chunk_size] for i in range(depth)]
+                free, filled = queue.Queue(), queue.Queue()
+                for slot in slots:
+                    free.put(slot)
+
+                def reader():
+                    try:
+                        while True:
+                            slot = free.get()
+                            if slot is None:  # Writer stopped early
+                                return
+                            n = os.readv(src_fd, [slot])
+                            filled.put((slot, n))
+                            if not n:
+                                return
+                    except Exception as e:
+                        filled.put((None, e))
+
+                read_thread = threading.Thread(target=reader, daemon=True)
+                read_thread.start()
+                try:
+                    while True:
+                        slot, n = filled.get()
+                        if slot is None:
+                            raise n
+                        if not n:
+                            break
+                        if n % _DIRECT_ALIGNMENT and dst_direct:
+                            # Only the final short read can be unaligned; O_DIRECT cannot write it
+                            fcntl.fcntl(dst_fd, fcntl.F_SETFL, fcntl.fcntl(dst_fd, fcntl.F_GETFL) & ~os.O_DIRECT)
+                            dst_direct = False
+                        written = 0
+                        while written < n:
+                            with slot[written:n] as pending:
+                                written += os.write(dst_fd, pending)
+                        free.put(slot)
+                finally:
+                    free.put(None)
+                    read_thread.join()
+                    for slot in slots:
+                        slot.release()
+                    view.release()
+        finally:
+            os.close(dst_fd)
+    finally:
+        os.close(src_fd)
+
+
+def copy_file(src_path, dst_path, chunk_size_kb=1024, direct=False):
+    """Copy a file from source to destination inside the kernel
+
+    Reserves the destination's full size first, then uses copy_file_range,
+    falling back to sendfile and, when the filesystems involved support
+    neither, to writing straight out of an mmap of the source (or a
+    read/write loop if the source cannot be mapped).
+
+    Args:
+        src_path: Source file path
+        dst_path: Destination file path
+        chunk_size_kb: Chunk size in KB for the read/write fallback (default: 1024)
+        direct: Copy through an aligned buffer with O_DIRECT on both files instead,
+                bypassing the page cache (buffered where a file refuses O_DIRECT)
+    """
+    if direct:
+        _copy_file_direct(src_path, dst_path, chunk_size_kb * 1024)
+        return
+
+    src_fd = os.open(src_path, os.O_RDONLY)
+    try:
+        dst_fd = os.open(dst_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            _fadvise(src_fd, 0, 0, 'POSIX_FADV_SEQUENTIAL')
+            src_stat = os.fstat(src_fd)
+            size = src_stat.st_size
+            devices = (src_stat.st_dev, os.fstat(dst_fd).st_dev)
+            # One extent reservation up front instead of growing dst write by write
+            _preallocate(dst_fd, size)
+            offset = 0
+            # Copy one drop window at a time so consumed source pages leave the cache
+            while offset < size:
+                window = min(_DROP_WINDOW, size - offset)
+                copied = _copy_fd_range(src_fd, dst_fd, window, devices)
+                if copied < window:
+                    offset += copied
+                    break
+                _fadvise(src_fd, offset, copied, 'POSIX_FADV_DONTNEED')
+                offset += copied
+            if offset < size and not _copy_fd_mmap(src_fd, dst_fd, chunk_size_kb * 1024, offset, size):
+                _copy_fd_loop(src_fd, dst_fd, chunk_size_kb * 1024, offset)
+        finally:
+            os.close(dst_fd)
+    finally:
+        os.close(src_fd)
+
+
+# errno values meaning "this zero-copy syscall is not usable for these files"
+_ZERO_COPY_UNSUPPORTED = (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EBADF)
+
+
+# (syscall, src st_dev, dst st_dev) combinations already refused by the kernel,
+# so copies between the same filesystems skip straight to what works
+_zero_copy_refused = set()
+
+
+def _copy_fd_range(src_fd, dst_fd, size, devices=None):
+    """Copy up to size bytes between the current offsets of two fds without a user buffer
+
+    Args:
+        devices: (src st_dev, dst st_dev), used to remember refused syscalls
+
+    Returns:
+        int: Number of bytes copied (less than size if both syscalls are unsupported)
+    """
+    copied = 0
+    for syscall in ('copy_file_range', 'sendfile'):
+        if not hasattr(os, syscall) or (syscall, devices) in _zero_copy_refused:
+            continue
+        try:
+            while copied < size:
+                if syscall == 'copy_file_range':
+                    sent = os.copy_file_range(src_fd, dst_fd, size - copied)
+                else:
+                    sent = os.sendfile(dst_fd, src_fd, None, size - copied)
+                if sent == 0:
+                    return copied
+                copied += sent
+            return copied
+        except OSError as e:
+            if e.errno not in _ZERO_COPY_UNSUPPORTED:
+                raise
+            if devices is not None:
+                _zero_copy_refused.add((syscall, devices))
+    return copied
+
+
+def _madvise(mm, offset, length, advice):
+    """madvise() a range of a mapping; a no-op where the advice is unavailable"""
+    if not hasattr(mmap, advice):
+        return
+    try:
+        mm.madvise(getattr(mmap, advice), offset, length)
+    except OSError:
+        pass  # Only a hint
+
+
+def _copy_fd_mmap(src_fd, dst_fd, chunk_size, offset, size):
+    """Copy src_fd[offset:size] to dst_fd by writing directly from a read-only mapping
+
+    Saves the copy into a user buffer that the read() loop makes. The mapping is
+    advised sequential, each window is prefetched with WILLNEED and dropped with
+    DONTNEED once written.
+
+    Returns:
+        bool: False if the source cannot be mmap'd (nothing was written then)
+    """
+    try:
+        mm = mmap.mmap(src_fd, size, prot=mmap.PROT_READ)
+    except (OSError, ValueError):
+        return False
+    try:
+        _madvise(mm, 0, size, 'MADV_SEQUENTIAL')
+        view = memoryview(mm)
+        try:
+            os.lseek(dst_fd, offset, os.SEEK_SET)
+            while offset < size:
+                window_end = min(offset - offset % _DROP_WINDOW + _DROP_WINDOW, size)
+                window_start = offset - offset % mmap.PAGESIZE
+                _madvise(mm, window_start, window_end - window_start, 'MADV_WILLNEED')
+                while offset < window_end:
+                    offset += os.write(dst_fd, view[offset:min(offset + chunk_size, window_end)])
+                _madvise(mm, window_start, window_end - window_start, 'MADV_DONTNEED')
+                _fadvise(src_fd, window_start, window_end - window_start, 'POSIX_FADV_DONTNEED')
+        finally:
+            view.release()
+    finally:
+        mm.close()
+    return True
+
+
+def _copy_fd_loop(src_fd, dst_fd, chunk_size, offset=0):
+    """Copy from the current offset of src_fd to EOF through a user buffer
+
+    Args:
+        offset: Current offset of src_fd, used to drop consumed pages from the cache
+    """
+    window_start = offset
+    while True:
+        chunk = os.read(src_fd, chunk_size)
+        if not chunk:
+            break
+        view = memoryview(chunk)
+        while view:
+            view = view[os.write(dst_fd, view):]
+        offset += len(chunk)
+        if offset - window_start >= _DROP_WINDOW:
+            _fadvise(src_fd, window_start, offset - window_start, 'POSIX_FADV_DONTNEED')
+            window_start = offset
+
+
+def _read_file_direct(file_path, chunk_size):
+    """Read a file with O_DIRECT into one page-aligned buffer and discard the data"""
+    chunk_size = max(_DIRECT_ALIGNMENT, chunk_size - chunk_size % _DIRECT_ALIGNMENT)
+    fd, _ = _open_direct(file_path, os.O_RDONLY)
+    try:
+        with mmap.mmap(-1, chunk_size) as buf:
+            view = memoryview(buf)
+            try:
+                while os.readv(fd, [view]):
+                    pass
+            finally:
+                view.release()
+    finally:
+        os.close(fd)
+
+
+# io_uring ring size, and files submitted per batch (one read and one write SQE each)
+_URING_ENTRIES = 1024
+_URING_BATCH = 256
+
+
+def _uring_run(ring, cqe, ops):
+    """Submit (fd, buf, write, offset) operations in one call and reap them all
+
+    Returns:
+        list: Result (bytes transferred) of each operation, in submission order
+    """
+    if not ops:
+        return []
+    for index, (fd, buf, write, offset) in enumerate(ops):
+        sqe = liburing.io_uring_get_sqe(ring)
+        if write:
+            liburing.io_uring_prep_write(sqe, fd, buf, offset)
+        else:
+            liburing.io_uring_prep_read(sqe, fd, buf, offset)
+        sqe.user_data = index
+    liburing.io_uring_submit_and_wait(ring, len(ops))
+
+    results = [None] * len(ops)
+    for _ in ops:
+        liburing.io_uring_wait_cqe(ring, cqe)
+        entry = cqe[0]
+        results[entry.user_data] = entry.res
+        liburing.io_uring_cqe_seen(ring, entry)
+    return results
+
+
+def _copy_batch_io_uring(ring, cqe, pairs):
+    """Copy a batch of small files: one submission for all reads, one for all writes"""
+    src_fds, dst_fds = [], []
+    done = set()
+    try:
+        for src_path, dst_path in pairs:
+            src_fds.append(os.open(src_path, os.O_RDONLY))
+            dst_fds.append(os.open(dst_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644))
+        bufs = [bytearray(os.fstat(fd).st_size) for fd in src_fds]
+
+        reads = _uring_run(ring, cqe, [(fd, buf, False, 0) for fd, buf in zip(src_fds, bufs)])
+        complete = [i for i, n in enumerate(reads) if n == len(bufs[i])]
+        writes = _uring_run(ring, cqe, [(dst_fds[i], bufs[i], True, 0) for i in complete])
+        done.update(i for i, n in zip(complete, writes) if n == len(bufs[i]))
+    finally:
+        for fd in src_fds + dst_fds:
+            os.close(fd)
+
+    # Short transfers are rare; finish those files synchronously
+    for i, (src_path, dst_path) in enumerate(pairs):
+        if i not in done:
+            copy_file(src_path, dst_path)
+
+
+def copy_files_io_uring(pairs):
+    """Copy many small files through io_uring (requires the liburing package)
+
+    Reads and writes are submitted in batches of 256 files, collapsing four
+    syscalls per file into two submit-and-wait calls per batch. Reads complete
+    before the writes are queued because the Python binding reports a broken
+    IOSQE_IO_LINK chain as an exception without identifying the entry.
+
+    Args:
+        pairs: List of (src_path, dst_path) tuples
+    """
+    ring = liburing.Ring()
+    cqe = liburing.Cqe()
+    liburing.io_uring_queue_init(_URING_ENTRIES, ring)
+    try:
+        for start in range(0, len(pairs), _URING_BATCH):
+            _copy_batch_io_uring(ring, cqe, pairs[start:start + _URING_BATCH])
+    finally:
+        liburing.io_uring_queue_exit(ring)
+
+
+def copy_file_io_uring(src_path, dst_path, chunk_size_kb=10240, depth=8):
+    """Copy one large file through io_uring (requires the liburing package)
+
+    Each round reads depth chunks with one submit-and-wait call and writes them
+    with another, instead of two syscalls per chunk. Anything left after a short
+    transfer is finished with a plain read/write loop.
+
+    Args:
+        src_path: Source file path
+        dst_path: Destination file path
+        chunk_size_kb: Chunk size in KB (default: 10240)
+        depth: Chunks in flight per submission (default: 8)
+    """
+    chunk_size = chunk_size_kb * 1024
+    bufs = [bytearray(chunk_size) for _ in range(depth)]
+    ring = liburing.Ring()
+    cqe = liburing.Cqe()
+    liburing.io_uring_queue_init(depth, ring)
+    try:
+        src_fd = os.open(src_path, os.O_RDONLY)
+        try:
+            dst_fd = os.open(dst_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+            try:
+                _fadvise(src_fd, 0, 0, 'POSIX_FADV_SEQUENTIAL')
+                size = os.fstat(src_fd).st_size
+                _preallocate(dst_fd, size)
+                offset = 0
+                while offset < size:
+                    chunks = []
+                    for k in range(min(depth, -(-(size - offset) // chunk_size))):
+                        start = offset + k * chunk_size
+                        length = min(chunk_size, size - start)
+                        chunks.append((start, bufs[k] if length == chunk_size else bytearray(length)))
+
+                    reads = _uring_run(ring, cqe, [(src_fd, buf, False, start) for start, buf in chunks])
+                    read_ok = 0
+                    while read_ok < len(chunks) and reads[read_ok] == len(chunks[read_ok][1]):
+                        read_ok += 1
+                    writes = _uring_run(ring, cqe, [(dst_fd, buf, True, start) for start, buf in chunks[:read_ok]])
+                    done = 0
+                    while done < read_ok and writes[done] == len(chunks[done][1]):
+                        done += 1
+
+                    copied = sum(len(buf) for _, buf in chunks[:done])
+                    if copied:
+                        _fadvise(src_fd, offset, copied, 'POSIX_FADV_DONTNEED')
+                    offset += copied
+                    if done < len(chunks):
+                        # Short read or write: finish synchronously from the first incomplete chunk
+                        os.lseek(src_fd, offset, os.SEEK_SET)
+                        os.lseek(dst_fd, offset, os.SEEK_SET)
+                        _copy_fd_loop(src_fd, dst_fd, chunk_size, offset)
+                        break
+            finally:
+                os.close(dst_fd)
+        finally:
+            os.close(src_fd)
+    finally:
+        liburing.io_uring_queue_exit(ring)
+
+
+def read_file(file_path, chunk_size_kb=10240, direct=False):
+    """Read a file using streaming
+
+    Args:
+        file_path: File path to read
+        chunk_size_kb: Chunk size in KB (default: 10240)
+        direct: Bypass the page cache with O_DIRECT where the filesystem allows it
+    """
+    chunk_size = chunk_size_kb * 1024  # Convert KB to bytes
+    if direct:
+        _read_file_direct(file_path, chunk_size)
+        return
+
+    with open(file_path, 'rb') as f:
+        fd = f.fileno()
+        _fadvise(fd, 0, 0, 'POSIX_FADV_SEQUENTIAL')
+        offset = window_start = 0
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            offset += len(chunk)
+            if offset - window_start >= _DROP_WINDOW:
+                _fadvise(fd, window_start, offset - window_start, 'POSIX_FADV_DONTNEED')
+                window_start = offset
+
+
+# Objects of 64MB and above are transferred as 64MB parts, 10 in flight per object
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=64 * 1024 * 1024,
+    multipart_chunksize=64 * 1024 * 1024,
+    max_concurrency=10,
+    max_io_queue=100,
+    use_threads=True
+)
+
+
+class _DevNull(io.RawIOBase):
+    """Seekable sink that discards everything written to it (just measure read speed)"""
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        return offset
+
+    def tell(self):
+        return 0
+
+    def write(self, b):
+        return len(b)
+
+
+def upload_file_to_s3(s3_client, bucket_name, object_key, local_file_path):
+    """Upload a local file to S3, as parallel multipart parts for large files
+
+    upload_file reads each part straight from the file; upload_fileobj would
+    copy every part of a seekable file into an in-memory buffer first.
+    """
+    s3_client.upload_file(local_file_path, bucket_name, object_key, Config=TRANSFER_CONFIG)
+
+
+def _discard_stream(stream, chunk_size):
+    """Read a stream to EOF in chunk_size reads and drop the data"""
+    while stream.read(chunk_size):
+        pass
+
+
+def download_file_from_s3(s3_client, bucket_name, object_key, object_size=None, chunk_size_kb=1024):
+    """Download a file from S3 by streaming, as parallel ranged GETs for large files
+
+    Args:
+        s3_client: boto3 S3 client
+        bucket_name: S3 bucket name
+        object_key: S3 object key
+        object_size: Object size in bytes if known; objects below the multipart
+                     threshold are fetched with one GET (no extra HEAD request)
+        chunk_size_kb: Read buffer size in KB for single-GET downloads (default: 1024)
+    """
+    if object_size is not None and object_size < TRANSFER_CONFIG.multipart_threshold:
+        response = s3_client.get_object(Bucket=bucket_name, Key=object_key)
+        # StreamingBody.read also checks the body against Content-Length
+        _discard_stream(response['Body'], chunk_size_kb * 1024)
+        response['Body'].close()
+        return
+
+    s3_client.download_fileobj(bucket_name, object_key, _DevNull(), Config=TRANSFER_CONFIG)
+
+
+def upload_file_presigned(http, url, local_file_path):
+    """PUT a file to a presigned URL through a plain urllib3 pool
+
+    Skips botocore's per-request signing, event hooks and response parsing.
+
+    Args:
+        http: urllib3.PoolManager shared by all workers
+        url: Presigned put_object URL
+        local_file_path: Local file path to upload
+    """
+    with open(local_file_path, 'rb') as f:
+        _fadvise(f.fileno(), 0, 0, 'POSIX_FADV_SEQUENTIAL')
+        size = os.fstat(f.fileno()).st_size
+        response = http.request('PUT', url, body=f, headers={'Content-Length': str(size)})
+    if response.status >= 300:
+        raise Exception(f"Presigned PUT failed with HTTP {response.status}: {response.data[:200]!r}")
+
+
+def download_file_presigned(http, url, chunk_size_kb=1024):
+    """GET a presigned URL through a plain urllib3 pool and discard the body"""
+    response = http.request('GET', url, preload_content=False)
+    try:
+        if response.status >= 300:
+            raise Exception(f"Presigned GET failed with HTTP {response.status}")
+        _discard_stream(response, chunk_size_kb * 1024)
+    finally:
+        response.release_conn()
+
+
+def _s3_connection_kwargs():
+    """Endpoint and credentials shared by the sync and async S3 clients"""
+    return {
+        'endpoint_url': 'http://minio.service.consul:9000',
+        'aws_access_key_id': os.environ.get('AWS_ACCESS_KEY_ID', 'minioadmin'),
+        'aws_secret_access_key': os.environ.get('AWS_SECRET_ACCESS_KEY', 'minioadmin'),
+    }
+
+
+def s3_endpoint_urls():
+    """One endpoint URL per address the S3 endpoint hostname resolves to"""
+    url = urllib3.util.parse_url(_s3_connection_kwargs()['endpoint_url'])
+    addresses = []
+    for *_, sockaddr in socket.getaddrinfo(url.host, url.port, type=socket.SOCK_STREAM):
+        if sockaddr[0] not in addresses:
+            addresses.append(sockaddr[0])
+    return [f"{url.scheme}://{f'[{ip}]' if ':' in ip else ip}:{url.port}" for ip in addresses]
+
+
+def create_s3_client(max_pool_connections=32, endpoint_url=None):
+    """Create a MinIO/S3 client whose connection pool fits the given concurrency
+
+    botocore defaults to 10 pooled connections; workers beyond that tear
+    down and re-establish connections on every request.
+
+    Args:
+        max_pool_connections: Size of the HTTP connection pool (default: 32)
+        endpoint_url: Override the configured endpoint (e.g. one resolved address)
+    """
+    connection_kwargs = _s3_connection_kwargs()
+    if endpoint_url is not None:
+        connection_kwargs['endpoint_url'] = endpoint_url
+    return boto3.client(
+        's3',
+        **connection_kwargs,
+        config=Config(
+            max_pool_connections=max_pool_connections,
+            # 'standard' rather than 'adaptive': adaptive adds a client-side rate limiter
+            retries={'max_attempts': 2, 'mode': 'standard'},
+            tcp_keepalive=True,
+            s3={'use_accelerate_endpoint': False}
+        )
+    )
+
+
+# Smallest pool handed out by get_s3_client, so Tests 3 and 4 map to the same client
+_SHARED_POOL_MIN = 64
+
+
+def get_s3_client(max_pool_connections=_SHARED_POOL_MIN):
+    """Return the process-wide S3 client for at least max_pool_connections
+
+    Requests are rounded up to _SHARED_POOL_MIN so successive tests reuse one
+    client, with its resolved endpoint, credentials and warm connection pool.
+    """
+    return _cached_s3_client(max(max_pool_connections, _SHARED_POOL_MIN))
+
+
+@functools.lru_cache(maxsize=None)
+def _cached_s3_client(max_pool_connections):
+    return create_s3_client(max_pool_connections)
+
+
+def delete_s3_objects(s3_client, bucket_name, object_keys):
+    """Delete objects with bulk DeleteObjects requests (up to 1000 keys each)
+
+    More than 4000 keys are deleted with 4 requests in flight. Falls back to one
+    DeleteObject per key on servers that do not implement DeleteObjects.
+
+    Args:
+        object_keys: Keys, or (key, version_id) tuples to delete specific versions
+    """
+    def entry(key):
+        if isinstance(key, tuple):
+            return {'Key': key[0], 'VersionId': key[1]}
+        return {'Key': key}
+
+    def delete_batch(start):
+        batch = [entry(key) for key in object_keys[start:start + 1000]]
+        try:
+            s3_client.delete_objects(Bucket=bucket_name, Delete={'Objects': batch, 'Quiet': True})
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') not in ('NotImplemented', 'MethodNotAllowed'):
+                raise
+            for obj in batch:
+                s3_client.delete_object(Bucket=bucket_name, **obj)
+
+    batches = range(0, len(object_keys), 1000)
+    if len(object_keys) <= 4000:
+        for start in batches:
+            delete_batch(start)
+        return
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        for future in as_completed([executor.submit(delete_batch, start) for start in batches]):
+            future.result()
+
+
+def delete_s3_bucket(s3_client, bucket_name, object_keys):
+    """Delete the test objects, any leftover versions on a versioned bucket, then the bucket"""
+    delete_s3_objects(s3_client, bucket_name, object_keys)
+
+    # On a versioned bucket the deletes above only added delete markers. An endpoint that
+    # cannot report versioning (unsupported, access denied) is treated as unversioned
+    try:
+        versioning = s3_client.get_bucket_versioning(Bucket=bucket_name).get('Status')
+    except ClientError:
+        versioning = None
+    if versioning in ('Enabled', 'Suspended'):
+        versions = []
+        for page in s3_client.get_paginator('list_object_versions').paginate(Bucket=bucket_name):
+            for item in page.get('Versions', []) + page.get('DeleteMarkers', []):
+                versions.append((item['Key'], item['VersionId']))
+        delete_s3_objects(s3_client, bucket_name, versions)
+
+    # Deletes can take a moment to become visible to the bucket-empty check
+    for attempt in range(3):
+        try:
+            s3_client.delete_bucket(Bucket=bucket_name)
+            return
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') != 'BucketNotEmpty' or attempt == 2:
+                raise
+            time.sleep(0.5)
+
+
+async def _gather_with_concurrency(limit, coros):
+    """Await all coroutines with at most limit of them in flight"""
+    semaphore = asyncio.Semaphore(limit)
+
+    async def run(coro):
+        async with semaphore:
+            return await coro
+
+    return await asyncio.gather(*(run(coro) for coro in coros))
+
+
+# Async upload bodies up to this size are read in one go; larger ones are streamed in pieces this big
+_ASYNC_BODY_CHUNK = 1024 * 1024
+
+
+class _FileChunks:
+    """Upload body that aiohttp streams in fixed-size pieces straight from the file
+
+    A plain file object makes aiohttp read it in 256KB run_in_executor jobs;
+    an async iterable is read on the event loop instead. read/seek/tell stay
+    available for botocore's request checksum.
+    """
+
+    def __init__(self, f, chunk_size):
+        self._f = f
+        self._chunk_size = chunk_size
+
+    def read(self, size=-1):
+        return self._f.read(size)
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        return self._f.seek(offset, whence)
+
+    def tell(self):
+        return self._f.tell()
+
+    async def __aiter__(self):
+        while chunk := self._f.read(self._chunk_size):
+            yield chunk
+
+
+async def transfer_small_files_async(bucket_name, object_keys, file_paths, concurrency, download=False):
+    """Upload (or download) small files with aioboto3 from a single event loop thread
+
+    One thread keeps up to concurrency requests in flight over a shared
+    connection pool, instead of one blocked OS thread per request.
+
+    Returns:
+        int: Nanoseconds spent transferring, excluding client setup
+    """
+    session = aioboto3.Session()
+    # Keep idle connections for a minute (aiohttp closes them after 15s) and cache DNS lookups
+    config = AioConfig(
+        max_pool_connections=concurrency,
+        connector_args={'keepalive_timeout': 60, 'use_dns_cache': True, 'ttl_dns_cache': 300},
+        retries={'max_attempts': 2, 'mode': 'standard'}
+    )
+    async with session.client('s3', **_s3_connection_kwargs(), config=config) as s3:
+
+        # Small bodies go as one bytes object; larger ones are streamed in 1MB pieces, since
+        # with concurrency objects of up to 100MB in flight whole-object buffers add up
+        async def upload(object_key, local_file_path):
+            with open(local_file_path, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                if size <= _ASYNC_BODY_CHUNK:
+                    await s3.put_object(Bucket=bucket_name, Key=object_key, Body=f.read())
+                else:
+                    await s3.put_object(Bucket=bucket_name, Key=object_key, ContentLength=size,
+                                        Body=_FileChunks(f, _ASYNC_BODY_CHUNK))
+
+        async def fetch(object_key):
+            response = await s3.get_object(Bucket=bucket_name, Key=object_key)
+            body = response['Body']
+            try:
+                async for _ in body.iter_chunks(1024 * 1024):
+                    pass
+            finally:
+                body.close()
+
+        if download:
+            coros = (fetch(key) for key in object_keys)
+        else:
+            coros = (upload(key, path) for key, path in zip(object_keys, file_paths))
+
+        with timed() as timer:
+            await _gather_with_concurrency(concurrency, coros)
+        return timer.ns
+
+
+async def transfer_presigned_http2(urls, file_paths, concurrency, download=False):
+    """PUT (or GET) presigned URLs with httpx over cleartext HTTP/2 (h2c)
+
+    Requests are multiplexed as streams over at most 8 connections instead of
+    holding one TCP connection per in-flight request. The server must accept
+    h2c with prior knowledge.
+
+    Returns:
+        int: Nanoseconds spent transferring, excluding client setup
+    """
+    limits = httpx.Limits(max_connections=8, max_keepalive_connections=8)
+    async with httpx.AsyncClient(http1=False, http2=True, limits=limits, timeout=None) as client:
+
+        async def file_chunks(f):
+            while True:
+                chunk = f.read(1024 * 1024)
+                if not chunk:
+                    return
+                yield chunk
+
+        async def upload(url, local_file_path):
+            with open(local_file_path, 'rb') as f:
+                headers = {'Content-Length': str(os.fstat(f.fileno()).st_size)}
+                response = await client.put(url, content=file_chunks(f), headers=headers)
+            if response.status_code >= 300:
+                raise Exception(f"HTTP/2 PUT failed with HTTP {response.status_code}: {response.text[:200]}")
+
+        async def fetch(url):
+            async with client.stream('GET', url) as response:
+                if response.status_code >= 300:
+                    raise Exception(f"HTTP/2 GET failed with HTTP {response.status_code}")
+                async for _ in response.aiter_raw(1024 * 1024):
+                    pass
+
+        if download:
+            coros = (fetch(url) for url in urls)
+        else:
+            coros = (upload(url, path) for url, path in zip(urls, file_paths))
+
+        with timed() as timer:
+            await _gather_with_concurrency(concurrency, coros)
+        return timer.ns
+
+
+# boto3 client owned by each S3 worker process (clients are not fork/pickle safe)
+_worker_s3_client = None
+
+
+# Socket send size for request bodies; http.client defaults to 8KB, urllib3 2.x to 16KB
+_HTTP_BLOCKSIZE = 1024 * 1024
+
+
+def _widen_http_blocksize(blocksize=_HTTP_BLOCKSIZE):
+    """Make new HTTP connections in this process send bodies in blocksize writes"""
+    import http.client
+    import urllib3.connection
+
+    defaults = http.client.HTTPConnection.__init__.__defaults__
+    http.client.HTTPConnection.__init__.__defaults__ = defaults[:-1] + (blocksize,)
+    kwdefaults = urllib3.connection.HTTPConnection.__init__.__kwdefaults__
+    if kwdefaults and 'blocksize' in kwdefaults:
+        kwdefaults['blocksize'] = blocksize
+
+
+def _init_s3_worker(max_pool_connections):
+    """ProcessPoolExecutor initializer: build this worker's own S3 client"""
+    global _worker_s3_client
+    _widen_http_blocksize()
+    _worker_s3_client = create_s3_client(max_pool_connections)
+
+
+def _ping_s3_worker(_):
+    """No-op task used to start the worker processes before timing"""
+
+
+def upload_in_worker(bucket_name, object_key, local_file_path):
+    """s3_process_pool task: upload a file with this worker's S3 client"""
+    upload_file_to_s3(_worker_s3_client, bucket_name, object_key, local_file_path)
+
+
+def download_in_worker(bucket_name, object_key, object_size):
+    """s3_process_pool task: download an object with this worker's S3 client"""
+    download_file_from_s3(_worker_s3_client, bucket_name, object_key, object_size)
+
+
+def s3_process_pool(parallel_writes, max_pool_connections):
+    """Start parallel_writes worker processes, each with its own S3 client
+
+    Worker start-up (interpreter, boto3 import, client) happens here, outside
+    the timed sections.
+    """
+    executor = ProcessPoolExecutor(
+        max_workers=parallel_writes,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=_init_s3_worker,
+        initargs=(max_pool_connections,)
+    )
+    list(executor.map(_ping_s3_worker, range(parallel_writes)))
+    return executor
+
+
+def resolve_s3_transport(s3_transport, size_kb):
+    """Pick how S3 requests are issued
+
+    'auto' uses aioboto3 for files below 100MB when it is installed, worker
+    processes for files below 1MB otherwise (the GIL caps threads there), and
+    threads for everything else. 'presigned' and 'http2' are never picked
+    automatically: they send each object as one plain PUT, without multipart
+    parallelism, and 'http2' needs a server that accepts h2c.
+    """
+    if s3_transport not in ('auto', 'threads', 'async', 'processes', 'presigned', 'http2'):
+        raise Exception(f"Unknown S3 transport: {s3_transport}")
+    if s3_transport == 'async' and aioboto3 is None:
+        raise Exception("S3 transport 'async' requires aioboto3")
+    if s3_transport == 'http2' and httpx is None:
+        raise Exception("S3 transport 'http2' requires httpx with HTTP/2 support (pip install 'httpx[http2]')")
+    if s3_transport != 'auto':
+        return s3_transport
+    if aioboto3 is not None and size_kb < 100 * 1024:
+        return 'async'
+    if size_kb < 1024:
+        return 'processes'
+    return 'threads'
+
+
+@functools.lru_cache(maxsize=1)
+def hdfs_filesystem():
+    """Connect to the default HDFS namenode through libhdfs once per process
+
+    Returns:
+        pyarrow.fs.HadoopFileSystem, or None if pyarrow or libhdfs is unavailable
+    """
+    if pafs is None:
+        return None
+    try:
+        return pafs.HadoopFileSystem(host='default')
+    except Exception as e:
+        print(f"Note: libhdfs unavailable, using hdfs dfs commands ({str(e).splitlines()[0]})")
+        return None
+
+
+def _copy_files_libhdfs(source, destination, num_threads, source_filesystem=None, destination_filesystem=None):
+    """Recursively copy a directory through pyarrow with num_threads I/O threads"""
+    pyarrow.set_io_thread_count(num_threads)
+    pafs.copy_files(
+        source,
+        destination,
+        source_filesystem=source_filesystem,
+        destination_filesystem=destination_filesystem,
+        chunk_size=16 * 1024 * 1024,
+        use_threads=True
+    )
+
+
+def copy_dir_to_hdfs_with_threads(local_dir, hdfs_dir, num_threads, use_libhdfs=True, hdfs=None):
+    """Copy all files from a local directory to HDFS using hdfs dfs -copyFromLocal command with -t flag
+
+    With use_libhdfs (and pyarrow installed) the copy goes through a persistent
+    libhdfs handle instead, skipping the JVM start-up of every hdfs dfs call.
+
+    Args:
+        local_dir: Local directory path containing files to copy
+        hdfs_dir: HDFS destination directory
+        num_threads: Number of threads for HDFS to use (-t flag)
+        use_libhdfs: Use pyarrow's HadoopFileSystem when available (default: True)
+        hdfs: Handle from hdfs_filesystem(), so callers can connect before timing
+              the copy (connected here when None)
+    """
+    if hdfs is None and use_libhdfs:
+        hdfs = hdfs_filesystem()
+    if hdfs is not None:
+        # Same layout as copyFromLocal into an existing directory: hdfs_dir/<basename>
+        destination = f"{hdfs_dir.rstrip('/')}/{os.path.basename(local_dir.rstrip('/'))}"
+        _copy_files_libhdfs(local_dir, destination, num_threads, destination_filesystem=hdfs)
+        return
+
+    # Build command: hdfs dfs -copyFromLocal -t <threads> local_dir hdfs_dir/
+    # The whole tree goes through one call, so the JVM starts once per copy, not once per file
+    cmd = ['hdfs', 'dfs', '-copyFromLocal', '-t', str(num_threads), local_dir, hdfs_dir]
+    result = subprocess.run(
+        cmd,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise Exception(f"Failed to copy directory {local_dir} to {hdfs_dir}: {result.stderr}")
+
+
+def copy_dir_to_hdfs_as_tar(local_dir, hdfs_dir):
+    """Stream a local directory into a single HDFS file, hdfs_dir/bundle.tar
+
+    The files are tarred straight into the stdin of one hdfs dfs -put process,
+    so many small files become one sequential stream and one namenode create.
+
+    Args:
+        local_dir: Local directory path containing files to copy
+        hdfs_dir: HDFS destination directory
+    """
+    hdfs_path = f"{hdfs_dir.rstrip('/')}/bundle.tar"
+    # stderr goes to a file so a chatty client cannot block on a full pipe while we write stdin
+    with tempfile.TemporaryFile() as stderr:
+        proc = subprocess.Popen(['hdfs', 'dfs', '-put', '-f', '-', hdfs_path], stdin=subprocess.PIPE, stderr=stderr)
+        try:
+            with tarfile.open(fileobj=proc.stdin, mode='w|') as tar:
+                tar.add(local_dir, arcname=os.path.basename(local_dir.rstrip('/')))
+        except BrokenPipeError:
+            pass  # The process exited early; its return code and stderr explain why
+        finally:
+            proc.stdin.close()
+        returncode = proc.wait()
+        stderr.seek(0)
+        if returncode != 0:
+            raise Exception(f"Failed to stream directory {local_dir} to {hdfs_path}: {stderr.read().decode(errors='replace')}")
+
+
+def copy_dir_from_hdfs_with_threads(hdfs_dir, local_dir, num_threads, use_libhdfs=True, hdfs=None):
+    """Copy all files from HDFS to a local directory using hdfs dfs -copyToLocal command with -t flag
+
+    Args:
+        hdfs_dir: HDFS source directory
+        local_dir: Local destination directory path
+        num_threads: Number of threads for HDFS to use (-t flag)
+        use_libhdfs: Use pyarrow's HadoopFileSystem when available (default: True)
+        hdfs: Handle from hdfs_filesystem(), so callers can connect before timing
+              the copy (connected here when None)
+    """
+    if hdfs is None and use_libhdfs:
+        hdfs = hdfs_filesystem()
+    if hdfs is not None:
+        # Same layout as copyToLocal into an existing directory: local_dir/<basename>
+        destination = os.path.join(local_dir, os.path.basename(hdfs_dir.rstrip('/')))
+        _copy_files_libhdfs(hdfs_dir, destination, num_threads, source_filesystem=hdfs)
+        return
+
+    # Build command: hdfs dfs -copyToLocal -t <threads> hdfs_dir local_dir/
+    cmd = ['hdfs', 'dfs', '-copyToLocal', '-t', str(num_threads), hdfs_dir, local_dir]
+    result = subprocess.run(
+        cmd,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise Exception(f"Failed to copy directory {hdfs_dir} to {local_dir}: {result.stderr}")
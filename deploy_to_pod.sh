@@ -150,6 +150,8 @@ trap "rm -rf $TEMP_DIR" EXIT
 
 # Copy project files to temp directory
 cp "$LOCAL_PATH/experiment.py" "$TEMP_DIR/"
+cp "$LOCAL_PATH/bench_io.py" "$TEMP_DIR/"
+cp "$LOCAL_PATH/timing.py" "$TEMP_DIR/"
 cp "$LOCAL_PATH/run_benchmark.py" "$TEMP_DIR/"
 
 # Copy any other Python files if they exist
@@ -5,172 +5,417 @@ Benchmark Runner for HopsFS Performance Evaluation
 """
 
 import argparse
+import asyncio
 import csv
+import functools
+import importlib
+import inspect
+import io
+import json
+import math
+import os
 import sys
-from experiment import test_large_files, test_small_files, test_files_s3, test_files_local_copy
+import threading
+import traceback
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+from statistics import fmean
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
-def run_test_multiple_times(test_func, num_runs, **kwargs):
-    """Run a test function multiple times and return all individual results"""
+
+def _usable_cpus():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+# Four writers per usable CPU keeps I/O-bound writers busy without piling up
+# context switches on small hosts; 32 stays the ceiling
+_DEFAULT_PARALLEL_WRITES = min(32, 4 * _usable_cpus())
+_CALIBRATION_WRITERS = (8, 16, 32, 64)
+
+
+def _bind_concurrent_run(bound_test, run):
+    """Give one concurrent run its own output location so runs don't collide
+
+    Args:
+        bound_test: functools.partial of the test function with its arguments
+        run: Zero-based run index
+
+    Returns:
+        functools.partial with output_dir, bucket_name and temp_dir suffixed
+    """
+    defaults = inspect.signature(bound_test.func).parameters
+    overrides = {}
+    for key, sep in (('output_dir', '_'), ('temp_dir', '_'), ('bucket_name', '-')):
+        if key in bound_test.keywords:
+            overrides[key] = f"{bound_test.keywords[key]}{sep}run{run + 1}"
+        elif key in defaults:
+            overrides[key] = f"{defaults[key].default}{sep}run{run + 1}"
+    return functools.partial(bound_test, **overrides)
+
+
+def run_test_multiple_times(bound_test, num_runs, concurrent_runs=1, test_name=None, sink=None, warmup=0, stop=None):
+    """Run a test function multiple times and return all individual results
+
+    bound_test is the test function with its arguments already bound via
+    functools.partial. With concurrent_runs > 1 up to that many runs execute
+    at once, each with its own output directory/bucket. When a sink is given
+    the result is recorded under test_name as soon as the last run finishes.
+    The first warmup runs (cold page cache, JVM startup, connection pool
+    ramp-up) execute one at a time and their results are discarded.
+    Once the stop event is set no further run is started; returns None if
+    no scored run completed.
+
+    Besides the mean of the per-run speeds, the aggregate speed (total MB over
+    total elapsed time) is reported when every run returned its elapsed_ns.
+    """
     all_write_speeds = []
     all_read_speeds = []
-
-    for run in range(num_runs):
-        if num_runs > 1:
-            print(f"  [Run {run + 1}/{num_runs}]")
-        result = test_func(**kwargs)
-        all_write_speeds.append(result['write_speed_mbs'])
-        all_read_speeds.append(result['read_speed_mbs'])
+    # Ratio of sums over the runs that reported elapsed_ns: [MB moved, ns elapsed]
+    write_totals = [0.0, 0]
+    read_totals = [0.0, 0]
+    timed_runs = 0
+    # Welford running variance: [count, mean, sum of squared deviations]
+    write_stats = [0, 0.0, 0.0]
+    read_stats = [0, 0.0, 0.0]
+
+    def record(result):
+        nonlocal timed_runs
+        # Speeds must come from perf_counter_ns timings (timing.timed), which tests report alongside
+        if 'write_elapsed_ns' not in result or 'read_elapsed_ns' not in result:
+            warnings.warn(f"{test_name or 'test'} result has no write/read_elapsed_ns; time test phases with "
+                          "timing.timed() and report their durations", DeprecationWarning)
+        else:
+            timed_runs += 1
+            for totals, speed, elapsed_ns in ((write_totals, result['write_speed_mbs'], result['write_elapsed_ns']),
+                                              (read_totals, result['read_speed_mbs'], result['read_elapsed_ns'])):
+                totals[0] += speed * elapsed_ns / 1e9
+                totals[1] += elapsed_ns
+        for speeds, stats, value in ((all_write_speeds, write_stats, result['write_speed_mbs']),
+                                     (all_read_speeds, read_stats, result['read_speed_mbs'])):
+            speeds.append(value)
+            stats[0] += 1
+            delta = value - stats[1]
+            stats[1] += delta / stats[0]
+            stats[2] += delta * (value - stats[1])
+
+    def stopping():
+        return stop is not None and stop.is_set()
+
+    for run in range(warmup):
+        if stopping():
+            return None
+        print(f"  [Warmup {run + 1}/{warmup}]")
+        bound_test()
+
+    if concurrent_runs > 1 and num_runs > 1:
+        print(f"  [Running {num_runs} runs, {concurrent_runs} at a time]")
+        with ThreadPoolExecutor(max_workers=concurrent_runs) as pool:
+            futures = [pool.submit(_bind_concurrent_run(bound_test, run)) for run in range(num_runs)]
+            for future in futures:
+                if stopping():
+                    future.cancel()  # Only cancels runs that have not started yet
+                else:
+                    record(future.result())
+    else:
+        for run in range(num_runs):
+            if stopping():
+                break
+            if num_runs > 1:
+                print(f"  [Run {run + 1}/{num_runs}]")
+            record(bound_test())
+
+    if not all_write_speeds:
+        return None
 
     # Calculate averages
-    avg_write = sum(all_write_speeds) / len(all_write_speeds)
-    avg_read = sum(all_read_speeds) / len(all_read_speeds)
+    avg_write = fmean(all_write_speeds)
+    avg_read = fmean(all_read_speeds)
+    stdev_write = math.sqrt(write_stats[2] / (write_stats[0] - 1)) if write_stats[0] > 1 else 0.0
+    stdev_read = math.sqrt(read_stats[2] / (read_stats[0] - 1)) if read_stats[0] > 1 else 0.0
+    aggregate_write = aggregate_read = None
+    if timed_runs == len(all_write_speeds) and write_totals[1] and read_totals[1]:
+        aggregate_write = write_totals[0] / (write_totals[1] / 1e9)
+        aggregate_read = read_totals[0] / (read_totals[1] / 1e9)
 
     if num_runs > 1:
-        print(f"  Average write speed: {avg_write:.2f} MB/s")
-        print(f"  Average read speed: {avg_read:.2f} MB/s")
+        print(f"  Average write speed: {avg_write:.2f} ± {stdev_write:.2f} MB/s")
+        print(f"  Average read speed: {avg_read:.2f} ± {stdev_read:.2f} MB/s")
+        if aggregate_write is not None:
+            print(f"  Aggregate write speed: {aggregate_write:.2f} MB/s (total MB / total time)")
+            print(f"  Aggregate read speed: {aggregate_read:.2f} MB/s (total MB / total time)")
 
-    return {
+    result = {
         'write_speed_mbs': avg_write,
         'read_speed_mbs': avg_read,
+        'stdev_write_speed_mbs': stdev_write,
+        'stdev_read_speed_mbs': stdev_read,
         'all_write_speeds': all_write_speeds,
-        'all_read_speeds': all_read_speeds
+        'all_read_speeds': all_read_speeds,
+        'aggregate_write_speed_mbs': aggregate_write,
+        'aggregate_read_speed_mbs': aggregate_read
     }
-
-
-def run_hopsfs_mount_tests(config):
-    """Run tests using HopsFS mount point"""
-    print("\n" + "=" * 80)
-    print("RUNNING HOPSFS-MOUNT TESTS")
-    print("=" * 80)
-
-    results = {}
-    num_runs = config.get('runs', 1)
-
-    # Test 1: Large files
-    print("\n--- Test 1: Large files (hopsfs-mount) ---")
-    results['Large files (hopsfs-mount)'] = run_test_multiple_times(
-        test_large_files,
-        num_runs,
-        output_dir=config.get('output_dir', '/hopsfs/Jupyter/test'),
-        num_files=config.get('num_files_large', 5),
-        size_gb=config.get('size_gb', 1)
-    )
-
-    # Test 2: Small files
-    print("\n--- Test 2: Small files (hopsfs-mount) ---")
-    results['Small files (hopsfs-mount)'] = run_test_multiple_times(
-        test_small_files,
-        num_runs,
-        output_dir=config.get('output_dir', '/hopsfs/Jupyter/test'),
-        total_files=config.get('num_files_small', 1000),
-        parallel_writes=config.get('parallel_writes', 32),
-        size_kb=config.get('size_kb', 100)
-    )
-
-    return results
-
-
-def run_minio_tests(config):
-    """Run tests using direct MinIO/S3 connection"""
-    print("\n" + "=" * 80)
-    print("RUNNING MINIO/S3 TESTS")
-    print("=" * 80)
-
-    results = {}
-    num_runs = config.get('runs', 1)
-
-    # Test 3: Large files
-    print("\n--- Test 3: Large files (S3) ---")
-    results['Large files (S3)'] = run_test_multiple_times(
-        test_files_s3,
-        num_runs,
-        bucket_name=config.get('bucket_large', 'test-large'),
-        num_files=config.get('num_files_large', 5),
-        size_kb=1024 * 1024  # 1GB
-    )
-
-    # Test 4: Small files
-    print("\n--- Test 4: Small files (S3) ---")
-    results['Small files (S3)'] = run_test_multiple_times(
-        test_files_s3,
-        num_runs,
-        bucket_name=config.get('bucket_small', 'test-small'),
-        num_files=config.get('num_files_small', 1000),
-        size_kb=config.get('size_kb', 100),
-        parallel_writes=config.get('parallel_writes', 32)
-    )
-
-    return results
-
-
-def run_java_client_tests(config):
-    """Run tests using HDFS Java client (hdfs dfs commands)"""
+    if sink is not None:
+        sink.record(test_name, result)
+    return result
+
+
+def _load_test(name):
+    """Import a test function from experiment on first use
+
+    experiment pulls in boto3, urllib3 and the other client libraries, so it is
+    only loaded once a test actually runs (not for --help or argument errors).
+    """
+    return getattr(importlib.import_module('experiment'), name)
+
+
+def _shared_s3_client(config):
+    """S3 client shared by both S3 tests (and all their runs)
+
+    The pool covers the larger of the two tests' concurrency (at least 100), so
+    every run reuses the same keep-alive connections instead of building a client.
+    """
+    bench_io = importlib.import_module('bench_io')
+    large_concurrency = config['num_files_large'] * bench_io.TRANSFER_CONFIG.max_concurrency
+    return bench_io.get_s3_client(max(100, 2 * config['parallel_writes'], large_concurrency))
+
+
+def calibrate_parallel_writes(config):
+    """Find the small-file writer count past which the HopsFS mount stops scaling
+
+    Runs a short small-file test with each of _CALIBRATION_WRITERS writers and
+    keeps the largest count reached before throughput falls more than 10%
+    below the best seen so far.
+
+    Returns:
+        int: Chosen number of parallel writers
+    """
+    print("\n--- Calibrating parallel writers (hopsfs-mount) ---")
+    config = {**CONFIG_DEFAULTS, **config}
+    best_writers, best_speed = None, 0.0
+    for writers in _CALIBRATION_WRITERS:
+        result = _load_test('test_small_files')(
+            output_dir=f"{config['output_dir']}_calibration",
+            total_files=writers * 16,
+            parallel_writes=writers,
+            size_kb=config['size_kb'],
+            shard_dirs=not config['flat_dirs'],
+            io_uring=False
+        )
+        speed = result['write_speed_mbs']
+        print(f"  {writers} writers: {speed:.2f} MB/s")
+        if best_writers is not None and speed < best_speed * 0.9:
+            break
+        best_writers = writers
+        best_speed = max(best_speed, speed)
+
+    print(f"  Using {best_writers} parallel writers")
+    return best_writers
+
+
+def run_group(group_name, specs, config, sink=None, stop=None):
+    """Run every experiment of one test group
+
+    Args:
+        group_name: Group name for the banner (e.g. 'HOPSFS-MOUNT')
+        specs: (test_name, test_func_name, kwargs_fn) tuples; test_func_name
+               names a function in experiment and kwargs_fn maps the config
+               dict to its keyword arguments
+        config: Benchmark configuration dict
+        sink: Optional ResultSink that receives each finished experiment
+        stop: Optional threading.Event; once set, no further run is started
+
+    Returns:
+        dict: Result of run_test_multiple_times per test name
+    """
     print("\n" + "=" * 80)
-    print("RUNNING JAVA-CLIENT (HDFS) TESTS")
+    print(f"RUNNING {group_name} TESTS")
     print("=" * 80)
 
+    config = {**CONFIG_DEFAULTS, **config}
     results = {}
-    num_runs = config.get('runs', 1)
-
-    # Test 5: Large files
-    print("\n--- Test 5: Large files (HDFS) ---")
-    results['Large files (HDFS)'] = run_test_multiple_times(
-        test_files_local_copy,
-        num_runs,
-        output_dir=f"{config.get('hdfs_output_dir', '/Projects/test')}/test_hdfs_large/tests",
-        num_files=config.get('num_files_large', 5),
-        size_kb=1024 * 1024  # 1GB
-    )
 
-    # Test 6: Small files
-    print("\n--- Test 6: Small files (HDFS) ---")
-    results['Small files (HDFS)'] = run_test_multiple_times(
-        test_files_local_copy,
-        num_runs,
-        output_dir=f"{config.get('hdfs_output_dir', '/Projects/test')}/test_hdfs_small/tests",
-        num_files=config.get('num_files_small', 1000),
-        size_kb=config.get('size_kb', 100),
-        parallel_writes=config.get('parallel_writes', 32)
-    )
+    for test_name, test_func_name, kwargs_fn in specs:
+        if stop is not None and stop.is_set():
+            break
+        print(f"\n--- Test {_TEST_NUMBERS[test_name]}: {test_name} ---")
+        result = run_test_multiple_times(
+            functools.partial(_load_test(test_func_name), **kwargs_fn(config)),
+            config['runs'],
+            concurrent_runs=config['concurrent_runs'],
+            test_name=test_name,
+            sink=sink,
+            warmup=config['warmup'],
+            stop=stop
+        )
+        if result is not None:
+            results[test_name] = result
 
     return results
 
 
-def write_results_to_csv(results):
-    """Write results to separate CSV files for write and read speeds"""
-    if not results:
-        return
-
-    # Determine number of runs from the first result
-    first_result = next(iter(results.values()))
-    num_runs = len(first_result['all_write_speeds'])
-
-    # Write speeds CSV
-    with open('write_speeds.csv', 'w', newline='') as f:
-        writer = csv.writer(f)
-        # Create header with run columns
-        header = ['Experiment'] + [f'Run {i+1} (MB/s)' for i in range(num_runs)]
-        writer.writerow(header)
+def safe_run_group(group_name, specs, config, sink=None, stop=None):
+    """run_group that reports a failing group and returns {} instead of raising
 
-        for test_name, speeds in results.items():
-            row = [test_name] + [f"{speed:.2f}" for speed in speeds['all_write_speeds']]
-            writer.writerow(row)
-
-    print("\nWrite speeds saved to: write_speeds.csv")
-
-    # Read speeds CSV
-    with open('read_speeds.csv', 'w', newline='') as f:
-        writer = csv.writer(f)
-        # Create header with run columns
-        header = ['Experiment'] + [f'Run {i+1} (MB/s)' for i in range(num_runs)]
-        writer.writerow(header)
-
-        for test_name, speeds in results.items():
-            row = [test_name] + [f"{speed:.2f}" for speed in speeds['all_read_speeds']]
-            writer.writerow(row)
-
-    print("Read speeds saved to: read_speeds.csv")
+    One broken backend then no longer discards the groups that still run.
+    KeyboardInterrupt is not an Exception and still aborts the benchmark.
+    """
+    try:
+        return run_group(group_name, specs, config, sink, stop)
+    except Exception:
+        traceback.print_exc()
+        print(f"[{group_name}] failed, continuing")
+        return {}
+
+
+# (group name, [(test name, experiment function name, config -> kwargs)]) in run order
+GROUPS = [
+    ('HOPSFS-MOUNT', [
+        ('Large files (hopsfs-mount)', 'test_large_files', lambda c: {
+            'output_dir': c['output_dir'],
+            'num_files': c['num_files_large'],
+            'size_gb': c['size_gb'],
+            'direct_io': c['direct_io'],
+            'fill_sources': c['fill_sources'],
+            'io_uring': c['io_uring'],
+        }),
+        ('Small files (hopsfs-mount)', 'test_small_files', lambda c: {
+            'output_dir': c['output_dir'],
+            'total_files': c['num_files_small'],
+            'parallel_writes': c['parallel_writes'],
+            'size_kb': c['size_kb'],
+            'shard_dirs': not c['flat_dirs'],
+            'io_uring': c['io_uring'],
+        }),
+    ]),
+    ('MINIO/S3', [
+        ('Large files (S3)', 'test_files_s3', lambda c: {
+            'bucket_name': c['bucket_large'],
+            'num_files': c['num_files_large'],
+            'size_kb': int(c['size_gb'] * 1024 * 1024),
+            's3_transport': c['s3_transport'],
+            'download_only_object_key': c['s3_download_key'],
+            'spread_endpoints': c['s3_spread_endpoints'],
+            's3_client': _shared_s3_client(c),
+        }),
+        ('Small files (S3)', 'test_files_s3', lambda c: {
+            'bucket_name': c['bucket_small'],
+            'num_files': c['num_files_small'],
+            'size_kb': c['size_kb'],
+            'parallel_writes': c['parallel_writes'],
+            's3_transport': c['s3_transport'],
+            'download_only_object_key': c['s3_download_key'],
+            'spread_endpoints': c['s3_spread_endpoints'],
+            's3_client': _shared_s3_client(c),
+        }),
+    ]),
+    ('JAVA-CLIENT (HDFS)', [
+        ('Large files (HDFS)', 'test_files_local_copy', lambda c: {
+            'output_dir': f"{c['hdfs_output_dir']}/test_hdfs_large/tests",
+            'num_files': c['num_files_large'],
+            'size_kb': int(c['size_gb'] * 1024 * 1024),
+            'use_libhdfs': not c['hdfs_cli'],
+        }),
+        ('Small files (HDFS)', 'test_files_local_copy', lambda c: {
+            'output_dir': f"{c['hdfs_output_dir']}/test_hdfs_small/tests",
+            'num_files': c['num_files_small'],
+            'size_kb': c['size_kb'],
+            'parallel_writes': c['parallel_writes'],
+            'use_libhdfs': not c['hdfs_cli'],
+            'tar_small_files': c['hdfs_tar_bundle'],
+        }),
+    ]),
+]
+_TEST_NUMBERS = {test_name: number
+                 for number, (test_name, _, _) in enumerate((spec for _, specs in GROUPS for spec in specs), 1)}
+
+
+class ResultSink:
+    """Append each finished experiment to the write/read speed CSV files
+
+    Rows are flushed and fsynced as they arrive, so an interrupted benchmark
+    still leaves the results of every experiment that completed. The two files
+    are independent, so both are written and fsynced at the same time. With
+    fast set (and numpy installed) the speeds of a row are formatted by
+    numpy.savetxt in one call instead of one Python format per run.
+    """
+
+    def __init__(self, num_runs, write_path='write_speeds.csv', read_path='read_speeds.csv', fast=False):
+        self.write_path = write_path
+        self.read_path = read_path
+        if fast and np is None:
+            print("Note: numpy is not installed, writing CSV rows with the csv module")
+        self.fast = fast and np is not None
+        self._lock = threading.Lock()
+        self._files = [open(write_path, 'w', newline='', buffering=1 << 16),
+                       open(read_path, 'w', newline='', buffering=1 << 16)]
+        # One thread per file; on a HopsFS mount every fsync is a round trip
+        self._pool = ThreadPoolExecutor(max_workers=len(self._files))
+        # Rows are formatted into one reused in-memory buffer and handed to each file in a single write()
+        self._rows = io.StringIO()
+        self._row_writer = csv.writer(self._rows, quoting=csv.QUOTE_MINIMAL)
+
+        header = self._format_row(['Experiment'] + [f'Run {i+1} (MB/s)' for i in range(num_runs)])
+        with self._lock:
+            self._emit([header, header])
+
+    def _format_row(self, row):
+        self._rows.seek(0)
+        self._rows.truncate()
+        self._row_writer.writerow(row)
+        return self._rows.getvalue()
+
+    def _format_row_fast(self, test_name, speeds):
+        self._rows.seek(0)
+        self._rows.truncate()
+        # Quote the name like the csv path, then drop its line terminator and append the speeds
+        self._row_writer.writerow([test_name, ''])
+        self._rows.truncate(self._rows.tell() - 2)
+        self._rows.seek(0, io.SEEK_END)
+        np.savetxt(self._rows, np.asarray(speeds, dtype=np.float64)[None, :], fmt='%.2f', delimiter=',',
+                   newline='\r\n')
+        return self._rows.getvalue()
+
+    @staticmethod
+    def _write_and_sync(f, text):
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+
+    def _emit(self, texts):
+        """Write texts[i] to file i, all files concurrently, and wait for the fsyncs"""
+        for future in [self._pool.submit(self._write_and_sync, f, text) for f, text in zip(self._files, texts)]:
+            future.result()
+
+    def record(self, test_name, result):
+        """Write one experiment's per-run speeds to both files
+
+        Args:
+            test_name: Experiment name for the first column
+            result: Result dict from run_test_multiple_times
+        """
+        with self._lock:
+            rows = []
+            for speeds in (result['all_write_speeds'], result['all_read_speeds']):
+                if self.fast:
+                    rows.append(self._format_row_fast(test_name, speeds))
+                else:
+                    rows.append(self._format_row([test_name, *(format(speed, '.2f') for speed in speeds)]))
+            self._emit(rows)
+
+    def close(self):
+        self._pool.shutdown()
+        for f in self._files:
+            try:
+                f.close()
+            except:
+                pass
 
 
 def print_results_summary(results):
@@ -186,14 +431,15 @@ def print_results_summary(results):
     print("-" * 80)
 
     for test_name, speeds in results.items():
-        write_speed = speeds['write_speed_mbs']
-        read_speed = speeds['read_speed_mbs']
-        print(f"{test_name:<35} {write_speed:>18.2f}  {read_speed:>18.2f}")
+        write_speed = f"{speeds['write_speed_mbs']:.2f} ± {speeds.get('stdev_write_speed_mbs', 0.0):.2f}"
+        read_speed = f"{speeds['read_speed_mbs']:.2f} ± {speeds.get('stdev_read_speed_mbs', 0.0):.2f}"
+        print(f"{test_name:<35} {write_speed:>18}  {read_speed:>18}")
 
     print("=" * 80)
 
 
-def main():
+def build_parser():
+    """Command-line parser for run_benchmark; its defaults also fill CONFIG_DEFAULTS"""
     parser = argparse.ArgumentParser(
         description='Run HopsFS performance benchmarks',
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -213,6 +459,9 @@ Examples:
 
   # Run each experiment 3 times and average the results
   python run_benchmark.py --all --runs 3
+
+  # Run the selected groups one after another instead of concurrently
+  python run_benchmark.py --all --serial
         """
     )
 
@@ -241,15 +490,91 @@ Examples:
                              help='Size of large files in GB (default: 1.0)')
     config_group.add_argument('--size-kb', type=int, default=100,
                              help='Size of small files in KB (default: 100)')
-    config_group.add_argument('--parallel-writes', type=int, default=32,
-                             help='Number of parallel writers (default: 32)')
+    config_group.add_argument('--parallel-writes', type=int, default=_DEFAULT_PARALLEL_WRITES,
+                             help='Number of parallel writers (default: 4 per usable CPU, at most 32; '
+                                  f'{_DEFAULT_PARALLEL_WRITES} here)')
+    config_group.add_argument('--auto-parallelism', action='store_true',
+                             help='Before the test groups start, calibrate the number of parallel writers with '
+                                  'short HopsFS mount small-file runs and use the knee for every group')
     config_group.add_argument('--bucket-large', type=str, default='test-large',
                              help='S3 bucket name for large files (default: test-large)')
     config_group.add_argument('--bucket-small', type=str, default='test-small',
                              help='S3 bucket name for small files (default: test-small)')
+    config_group.add_argument('--s3-transport', choices=['auto', 'threads', 'async', 'processes', 'presigned', 'http2'],
+                             default='auto',
+                             help='How S3 requests are issued: worker threads, aioboto3 event loop, worker '
+                                  'processes, plain urllib3 requests to presigned URLs, or httpx HTTP/2 (h2c) '
+                                  'requests to presigned URLs (default: auto picks by file size and installed '
+                                  'packages)')
+    config_group.add_argument('--s3-download-key', type=str, default=None,
+                             help='Measure S3 reads as parallel GETs of this single object key instead of '
+                                  'one GET per uploaded file')
+    config_group.add_argument('--s3-spread-endpoints', action='store_true',
+                             help='Round-robin S3 requests over every address the endpoint hostname resolves to '
+                                  '(threads and presigned transports)')
     config_group.add_argument('--runs', type=int, default=1,
                              help='Number of times to run each experiment (default: 1)')
-
+    config_group.add_argument('--warmup', type=int, default=1,
+                             help='Number of unscored runs before each experiment, to warm caches, the JVM '
+                                  'and connection pools (default: 1)')
+    config_group.add_argument('--concurrent-runs', type=int, default=1,
+                             help='Number of runs of each experiment to execute at once, each with its own '
+                                  'output directory/bucket (default: 1)')
+    config_group.add_argument('--fast-csv', action='store_true',
+                             help='Format the per-run speeds in the CSV files with numpy.savetxt (needs numpy)')
+    config_group.add_argument('--serial', action='store_true',
+                             help='Run the selected test groups one after another instead of concurrently')
+    config_group.add_argument('--direct-io', action='store_true',
+                             help='Copy large files and read them back with O_DIRECT, bypassing the page cache '
+                                  '(falls back to buffered I/O where the mount refuses it)')
+    config_group.add_argument('--flat-dirs', action='store_true',
+                             help='Write the HopsFS mount small files into one directory instead of one '
+                                  'subdirectory per writer')
+    config_group.add_argument('--fill-sources', action='store_true',
+                             help='Write real zero blocks into the large source files instead of preallocating them')
+    config_group.add_argument('--iouring', action='store_true', dest='io_uring',
+                             help='Copy the HopsFS mount large and small files with batched io_uring reads/writes '
+                                  '(needs liburing; falls back to the regular copy otherwise)')
+    config_group.add_argument('--hdfs-cli', action='store_true',
+                             help='Copy HDFS test files with hdfs dfs commands even when pyarrow/libhdfs is available')
+    config_group.add_argument('--hdfs-tar-bundle', action='store_true',
+                             help='Upload the HDFS small files as one streamed tar file instead of one file each')
+
+    return parser
+
+
+# Config dict keys read by run_group and the GROUPS table; each is the dest of a command-line option
+_CONFIG_KEYS = (
+    'output_dir',
+    'hdfs_output_dir',
+    'num_files_large',
+    'num_files_small',
+    'size_gb',
+    'size_kb',
+    'parallel_writes',
+    'bucket_large',
+    'bucket_small',
+    'runs',
+    'concurrent_runs',
+    'warmup',
+    's3_transport',
+    's3_download_key',
+    's3_spread_endpoints',
+    'direct_io',
+    'flat_dirs',
+    'fill_sources',
+    'io_uring',
+    'hdfs_cli',
+    'hdfs_tar_bundle',
+)
+
+# Fallbacks for config keys a caller leaves out, taken from the command-line defaults so programmatic
+# and CLI runs behave the same; merged in once per group
+CONFIG_DEFAULTS = {key: value for key, value in vars(build_parser().parse_args([])).items() if key in _CONFIG_KEYS}
+
+
+async def amain():
+    parser = build_parser()
     args = parser.parse_args()
 
     # If no group is specified, show help
@@ -258,67 +583,100 @@ Examples:
         print("\nError: Please specify at least one test group to run.")
         sys.exit(1)
 
+    # Reject unusable values before any client or mount is touched
+    for name in ('size_gb', 'size_kb', 'num_files_large', 'num_files_small', 'parallel_writes', 'runs',
+                 'concurrent_runs'):
+        if getattr(args, name) <= 0:
+            parser.error(f"--{name.replace('_', '-')} must be positive (got {getattr(args, name)})")
+    if args.warmup < 0:
+        parser.error(f"--warmup must not be negative (got {args.warmup})")
+    if args.parallel_writes > 512:
+        parser.error(f"--parallel-writes must be at most 512 (got {args.parallel_writes})")
+    if args.parallel_writes > 80:
+        print(f"Note: {args.parallel_writes} parallel writers is past the point where MinIO throughput "
+              "usually starts to drop (~80)")
+
     # Build configuration dictionary
-    config = {
-        'output_dir': args.output_dir,
-        'hdfs_output_dir': args.hdfs_output_dir,
-        'num_files_large': args.num_files_large,
-        'num_files_small': args.num_files_small,
-        'size_gb': args.size_gb,
-        'size_kb': args.size_kb,
-        'parallel_writes': args.parallel_writes,
-        'bucket_large': args.bucket_large,
-        'bucket_small': args.bucket_small,
-        'runs': args.runs,
-    }
+    config = {key: getattr(args, key) for key in _CONFIG_KEYS}
 
     # Determine which tests to run
-    run_hopsfs = args.all or args.hopsfs_mount
-    run_minio = args.all or args.minio
-    run_hdfs = args.all or args.java_client
+    selected_names = set()
+    if args.all or args.hopsfs_mount:
+        selected_names.add('HOPSFS-MOUNT')
+    if args.all or args.minio:
+        selected_names.add('MINIO/S3')
+    if args.all or args.java_client:
+        selected_names.add('JAVA-CLIENT (HDFS)')
+    selected = [(group_name, specs) for group_name, specs in GROUPS if group_name in selected_names]
 
     print("HopsFS Performance Benchmark Runner")
     print("=" * 50)
     print(f"Test groups selected:")
-    print(f"  - HopsFS Mount: {'Yes' if run_hopsfs else 'No'}")
-    print(f"  - MinIO/S3:     {'Yes' if run_minio else 'No'}")
-    print(f"  - Java Client:  {'Yes' if run_hdfs else 'No'}")
-    print(f"Runs per experiment: {config['runs']}")
+    print(f"  - HopsFS Mount: {'Yes' if 'HOPSFS-MOUNT' in selected_names else 'No'}")
+    print(f"  - MinIO/S3:     {'Yes' if 'MINIO/S3' in selected_names else 'No'}")
+    print(f"  - Java Client:  {'Yes' if 'JAVA-CLIENT (HDFS)' in selected_names else 'No'}")
+    print(f"Runs per experiment: {config['runs']} (+{config['warmup']} warmup)")
+    print(f"Group scheduling:    {'serial' if args.serial else 'concurrent'}")
+    print("Effective configuration:")
+    print(json.dumps(config, indent=2, sort_keys=True))
     print("=" * 50)
 
     # Run selected tests
     all_results = {}
 
-    try:
-        if run_hopsfs:
-            results = run_hopsfs_mount_tests(config)
-            all_results.update(results)
+    if args.auto_parallelism:
+        if 'HOPSFS-MOUNT' in selected_names:
+            config['parallel_writes'] = calibrate_parallel_writes(config)
+        else:
+            print("Note: --auto-parallelism calibrates on the HopsFS mount; "
+                  f"keeping {config['parallel_writes']} parallel writers")
 
-        if run_minio:
-            results = run_minio_tests(config)
-            all_results.update(results)
+    sink = ResultSink(config['runs'], fast=args.fast_csv)
+    # Groups run on worker threads even with --serial, so Ctrl-C reaches the event loop
+    # at once; the stop event then lets the running tests finish before the sink closes
+    stop = threading.Event()
+    group_pool = ThreadPoolExecutor(max_workers=1 if args.serial else max(len(selected), 1))
 
-        if run_hdfs:
-            results = run_java_client_tests(config)
+    try:
+        # The groups exercise independent backends, so by default they overlap;
+        # results are merged after they all finish, in selection order
+        futures = [group_pool.submit(safe_run_group, group_name, specs, config, sink, stop)
+                   for group_name, specs in selected]
+        try:
+            results_list = await asyncio.gather(*[asyncio.wrap_future(future) for future in futures])
+        except asyncio.CancelledError:
+            stop.set()
+            print("\n\nInterrupted: waiting for the running tests to finish (Ctrl-C again to quit now)...")
+            group_pool.shutdown(wait=True, cancel_futures=True)
+            raise KeyboardInterrupt
+
+        for results in results_list:
             all_results.update(results)
 
         # Print summary
         print_results_summary(all_results)
 
-        # Write results to CSV files
-        write_results_to_csv(all_results)
+        print(f"\nWrite speeds saved to: {sink.write_path}")
+        print(f"Read speeds saved to: {sink.read_path}")
 
         print("\n" + "=" * 50)
         print("Benchmark complete!")
 
     except KeyboardInterrupt:
         print("\n\nBenchmark interrupted by user.")
+        print(f"Results of completed experiments are in {sink.write_path} and {sink.read_path}")
         sys.exit(1)
     except Exception as e:
         print(f"\n\nError during benchmark execution: {e}")
-        import traceback
         traceback.print_exc()
         sys.exit(1)
+    finally:
+        group_pool.shutdown(wait=False, cancel_futures=True)
+        sink.close()
+
+
+def main():
+    asyncio.run(amain())
 
 
 if __name__ == '__main__':
@@ -0,0 +1,44 @@
+"""
+Monotonic timing for the benchmark tests
+
+Test phases are timed with time.perf_counter_ns() so measurements are not
+affected by wall-clock (NTP) adjustments and keep nanosecond integers until
+the final speed calculation.
+
+"""
+
+import time
+from contextlib import contextmanager
+
+
+class Timer:
+    """Elapsed time of a timed() block, filled in when the block exits"""
+
+    __slots__ = ('ns',)
+
+    def __init__(self):
+        self.ns = 0
+
+    @property
+    def seconds(self):
+        return self.ns / 1e9
+
+
+@contextmanager
+def timed():
+    """Time the enclosed block with perf_counter_ns
+
+    Usage:
+        with timed() as t:
+            ...
+        elapsed_ns = t.ns
+
+    Yields:
+        Timer: Holds the elapsed nanoseconds (ns) once the block exits
+    """
+    timer = Timer()
+    start = time.perf_counter_ns()
+    try:
+        yield timer
+    finally:
+        timer.ns = time.perf_counter_ns() - start